@@ -0,0 +1,234 @@
+#!/usr/bin/env python3
+"""
+Shared precompiled patterns and string helpers for the optimizer scripts.
+
+aggressive_optimize.py, generate_correct_optimized.py,
+generate_final_optimized.py, and manual_test.py previously each carried their
+own copies of the whitespace cleanup, sentence capitalization, and filler
+machinery. Centralizing them here means the compile work happens once per
+process (and, under PyPy, JIT warmup of the shared helpers is amortized
+across scripts); each script imports the subset it needs.
+"""
+
+import functools
+import re
+
+try:
+    import ahocorasick
+except ImportError:  # optional accelerator; pure-Python paths are used without it
+    ahocorasick = None
+
+try:
+    import numpy as np
+    from numba import njit
+except ImportError:  # optional accelerator (CPython-only); regex path used without it
+    njit = None
+
+
+@functools.lru_cache(maxsize=None)
+def load_prompt(path):
+    """Read and strip a prompt file once; warm-cache calls skip the I/O."""
+    with open(path, 'r') as f:
+        return f.read().strip()
+
+
+# --- Whitespace cleanup -----------------------------------------------------
+# One fused pass per variant: branch 1 strips whitespace before punctuation,
+# the fallback branch collapses space runs to a single space.
+
+# Any whitespace before [.,;:] (aggressive pipeline)
+WS_CLEAN_AGGRESSIVE = re.compile(r'(\s+)(?=[.,;:])| {2,}')
+# Space runs before [.,!?] (v0.2 generator, manual simulation)
+WS_CLEAN_BASIC = re.compile(r'( +)(?=[.,!?])| {2,}')
+# Any whitespace before a comma, space runs before [.;:] (v0.3 generator)
+WS_CLEAN_V03 = re.compile(r'(\s+(?=,)| +(?=[.;:]))| {2,}')
+
+
+def ws_clean_repl(m):
+    return '' if m.group(1) else ' '
+
+
+# --- Sentence capitalization ------------------------------------------------
+
+# First letter of the text (or line, in the MULTILINE variant) or the first
+# letter after sentence-ending punctuation.
+SENT_START = re.compile(r'(^|[.!?]\s*)([a-z])')
+SENT_START_MULTILINE = re.compile(r'(^|[.!?]\s*)([a-z])', re.MULTILINE)
+# ASCII twin: the narrow 0-127 tables skip the Unicode \s machinery; only
+# safe when the input is known ASCII (capitalize_sentences checks).
+SENT_START_ASCII = re.compile(r'(^|[.!?]\s*)([a-z])', re.ASCII)
+
+
+def sent_start_repl(m):
+    return m.group(1) + m.group(2).upper()
+
+
+if njit is not None:
+    @njit(cache=True)
+    def _cap_sentences_kernel(buf):
+        """Uppercase sentence-start letters in a uint8 buffer, in place.
+
+        State machine over raw bytes mirroring SENT_START: a lowercase
+        letter at position 0, or the first lowercase letter after
+        sentence-ending punctuation plus optional whitespace, is uppercased.
+        No re inside — regex is unsupported in njit mode.
+        """
+        expect = 1  # 1: strict text start, 2: after .!? (whitespace allowed), 0: none
+        for i in range(buf.shape[0]):
+            c = buf[i]
+            if expect != 0:
+                if 97 <= c <= 122:  # a-z
+                    buf[i] = c - 32
+                    expect = 0
+                elif expect == 2 and (c == 32 or 9 <= c <= 13):
+                    pass  # skip whitespace after punctuation
+                else:
+                    expect = 0
+            if c == 46 or c == 33 or c == 63:  # . ! ?
+                expect = 2
+        return buf
+
+
+@functools.lru_cache(maxsize=256)
+def capitalize_sentences(text):
+    """Capitalize sentence starts; jitted byte kernel when input is ASCII."""
+    if text.isascii():
+        if njit is not None:
+            buf = np.frombuffer(text.encode('ascii'), dtype=np.uint8).copy()
+            return bytes(_cap_sentences_kernel(buf)).decode('ascii')
+        return SENT_START_ASCII.sub(sent_start_repl, text)
+    return SENT_START.sub(sent_start_repl, text)
+
+
+def first_n_sentence_starts(text, n=5):
+    """Yield offsets of the first n sentence starts after [.!?]+whitespace.
+
+    Single forward scan with early exit — replaces the re.split(r'[.!?]\\s+')
+    quality checks that built the full fragment list only to inspect the
+    first character of each sentence.
+    """
+    i = 0
+    length = len(text)
+    found = 0
+    while i < length and found < n:
+        if text[i] in '.!?' and i + 1 < length and text[i + 1].isspace():
+            i += 1
+            while i < length and text[i].isspace():
+                i += 1
+            if i < length:
+                yield i
+                found += 1
+        else:
+            i += 1
+
+
+# --- Pipeline codegen ---------------------------------------------------------
+
+
+def unrolled_sub_chain(table):
+    """exec-generate a function applying each (bound sub, repl) in order.
+
+    The pattern tables are compile-time constants, so the per-call loop
+    header and tuple unpacking can be specialized away: the generated body is
+    straight-line ``r = _s0(_r0, r); r = _s1(_r1, r); ...`` over prebound sub
+    methods and replacements (strings or callables) held in the exec globals.
+    """
+    namespace = {}
+    for i, (sub, repl) in enumerate(table):
+        namespace[f'_s{i}'] = sub
+        namespace[f'_r{i}'] = repl
+    src = 'def _run(r):\n' + ''.join(
+        f'    r = _s{i}(_r{i}, r)\n' for i in range(len(table))
+    ) + '    return r\n'
+    exec(src, namespace)
+    return namespace['_run']
+
+
+# --- Filler / literal-word removal -------------------------------------------
+
+
+def filler_alternation(words, flags=re.IGNORECASE):
+    """Compile one \\b-anchored alternation (longest-first) for a word list."""
+    return re.compile(
+        r'\b(?:' + '|'.join(map(re.escape, sorted(words, key=len, reverse=True))) + r')\b\s*',
+        flags
+    )
+
+
+def drop_fillers(text, filler_set):
+    """Remove filler words in one boundary-scan pass — no regex engine.
+
+    Walks maximal word-character runs (isalnum/underscore, the same
+    boundary test drop_words_ac uses) and drops a run plus its trailing
+    whitespace when its lowercased form is in the set. These are exactly
+    the matches \\b<word>\\b\\s* makes — including inside quotes or next to
+    hyphens, where the old whole-token split left the filler behind. The
+    scan classifies and slices the original string directly, so there is
+    no lowered-copy index hazard and no ASCII restriction.
+    """
+    n = len(text)
+    out = []
+    last = 0
+    i = 0
+    while i < n:
+        ch = text[i]
+        if ch.isalnum() or ch == '_':
+            j = i + 1
+            while j < n and (text[j].isalnum() or text[j] == '_'):
+                j += 1
+            if text[i:j].lower() in filler_set:
+                out.append(text[last:i])
+                while j < n and text[j].isspace():
+                    j += 1
+                last = j
+            i = j
+        else:
+            i += 1
+    out.append(text[last:])
+    return ''.join(out)
+
+
+def build_word_automaton(words):
+    """Build an Aho-Corasick automaton for a literal word set, or None."""
+    if ahocorasick is None:
+        return None
+    automaton = ahocorasick.Automaton()
+    for word in words:
+        automaton.add_word(word, word)
+    automaton.make_automaton()
+    return automaton
+
+
+def drop_words_ac(text, words, automaton):
+    """Remove literal words (plus trailing whitespace) in one automaton pass.
+
+    Matches are filtered by a \\w-style boundary check on the surrounding
+    characters, mirroring the \\b<word>\\b\\s* regex semantics, and the output
+    is rebuilt with a single list+join over the surviving slices.
+
+    ASCII only: spans are found on text.lower() and spliced out of text by
+    index, which requires lower() to be length-preserving (not true of e.g.
+    'İ', which lowers to two code points). Callers must gate on
+    text.isascii() and take their regex/token fallback otherwise.
+    """
+    low = text.lower()
+    n = len(text)
+    out = []
+    last = 0
+    for end, word in automaton.iter(low):
+        if word not in words:
+            continue
+        start = end - len(word) + 1
+        if start < last:
+            continue  # inside a span already removed
+        if start > 0 and (low[start - 1].isalnum() or low[start - 1] == '_'):
+            continue
+        j = end + 1
+        if j < n and (low[j].isalnum() or low[j] == '_'):
+            continue
+        out.append(text[last:start])
+        while j < n and text[j].isspace():
+            j += 1
+        last = j
+    out.append(text[last:])
+    return ''.join(out)
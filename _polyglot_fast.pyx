@@ -0,0 +1,163 @@
+# cython: language_level=3
+"""Compiled twin of apply_all_optimizations from test_optimization_goals.py.
+
+The pipeline is pure-Python orchestration around re.sub calls; compiling it
+moves the loop headers, local reads and string plumbing out of the bytecode
+interpreter while the pattern work stays in re's C engine. Build in place
+with
+
+    cythonize -3 -i _polyglot_fast.pyx
+
+(no package setup needed); test_optimization_goals.py imports this module
+when the built extension is present and falls back to its own pure-Python
+body otherwise. Keep the tables below in sync with that script.
+"""
+
+import re
+
+# Boilerplate removal (complete sentences first, then partial); the last
+# element is the lowercase literal anchor that gates each sub. Each row also
+# carries the lowercased pattern compiled without IGNORECASE: on ASCII text
+# the matches are found case-sensitively on a lowered snapshot and spliced
+# out of the original by index (ASCII lower() preserves length), skipping
+# per-comparison case folding; non-ASCII text keeps the IGNORECASE subs.
+_BOILERPLATE = [
+    (re.compile(p, re.IGNORECASE).sub, re.compile(p.lower()).finditer, r, a)
+    for p, r, a in [
+    (r"Thank you (so much )?+in advance for [^.!?]+[.!?]", "", "thank you"),
+    (r"I would (really )?+appreciate (it )?+if you could\s*", "", "appreciate"),
+    (r"Please make sure to\s*", "", "please make sure to"),
+    (r"If you don't mind,?\s*", "", "if you don't mind"),
+    (r"I('m| am) looking for help with\s*", "", "looking for help with"),
+    (r"Could you please\s*", "", "could you please"),
+    (r"Would you mind\s*", "", "would you mind"),
+    (r"It would be great if\s*", "", "it would be great if"),
+    (r"I hope you('re| are) doing well\.?\s*", "", "i hope you"),
+    (r"Hello!?\s*", "", "hello"),
+    (r"I appreciate your help\.?\s*", "", "i appreciate your help"),
+    (r"Thanks (so much )?+for your (time|help)\.?\s*", "", "thanks"),
+]]
+
+# Instruction compression
+_INSTRUCTIONS = [
+    (re.compile(p, re.IGNORECASE).sub, re.compile(p.lower()).finditer, r, a)
+    for p, r, a in [
+    (r"I want you to\s+", "", "i want you to"),
+    (r"I would like you to\s+", "", "i would like you to"),
+    (r"I would also like you to\s+", "", "i would also like you to"),
+    (r"I need you to\s+", "", "i need you to"),
+    (r"take the time to\s+", "", "take the time to"),
+]]
+
+# Filler words (longest-first fused alternation)
+_FILLER_WORDS = ['really', 'very', 'quite', 'just', 'actually', 'basically',
+                 'essentially', 'definitely', 'absolutely', 'certainly', 'carefully',
+                 'also', 'furthermore', 'moreover', 'indeed', 'clearly', 'obviously']
+_FILLERS = re.compile(
+    r'\b(?:' + '|'.join(sorted(_FILLER_WORDS, key=len, reverse=True)) + r')\b\s*',
+    re.IGNORECASE,
+)
+
+# Redundant phrases
+_REDUNDANT = [(re.compile(p, re.IGNORECASE).sub, r) for p, r in [
+    (r"very\s+detailed\s+and\s+thorough", "detailed"),
+    (r"detailed\s+and\s+thorough", "detailed"),
+    (r"problems?\s+(or|and)\s+issues", "issues"),
+    (r"bugs?\s+(or|and)\s+issues", "bugs"),
+    (r"that\s+I'?m\s+working\s+on", ""),
+    (r"this\s+code\s+snippet", "this code"),
+    (r"any\s+potential\s+", "any "),
+]]
+
+# Unit conversions: one scan with a dispatch map; kilometers ahead of
+# meters so the longer unit wins.
+_UNITS = re.compile(r"\b(\d+)\s*(kilometers?|meters?|minutes?|percent)\b")
+_UNIT_MAP = {
+    "kilometer": "km", "kilometers": "km",
+    "meter": "m", "meters": "m",
+    "minute": "min", "minutes": "min",
+    "percent": "%",
+}
+
+
+def _units_repl(m):
+    return m.group(1) + _UNIT_MAP[m.group(2)]
+
+
+# Structural optimizations (case-sensitive)
+_STRUCTURAL = [(re.compile(p).sub, r) for p, r in [
+    (r"\n\n\n+", "\n\n"),
+    (r"  +", " "),
+    (r"={3,}", ""),
+    (r"!{2,}", "!"),
+    (r"\?{2,}", "?"),
+]]
+
+_WS_PUNCT = re.compile(r' +([.,!?])')
+# \n arms the capitalizer too: the per-line whitespace collapse strips the
+# trailing space from a ". \n" seam before this runs.
+_SENT_CAP = re.compile(r'([.!?][ \n][\W\d_]*)([^\W\d_])')
+
+
+def _sent_cap_repl(m):
+    return m.group(1) + m.group(2).upper()
+
+
+cdef tuple _splice_out(str result, str lowered, finditer):
+    """Delete every span found on the lowered snapshot from both strings."""
+    cdef list spans = [m.span() for m in finditer(lowered)]
+    if not spans:
+        return result, lowered
+    cdef list res_parts = []
+    cdef list low_parts = []
+    cdef Py_ssize_t prev = 0, start, end
+    for start, end in spans:
+        res_parts.append(result[prev:start])
+        low_parts.append(lowered[prev:start])
+        prev = end
+    res_parts.append(result[prev:])
+    low_parts.append(lowered[prev:])
+    return ''.join(res_parts), ''.join(low_parts)
+
+
+cpdef str apply_all_optimizations(str text):
+    """Apply all v0.2 optimizations (compiled orchestration)."""
+    cdef str result = text
+    cdef str low = text.lower()
+    cdef str anchor, repl, line
+
+    if result.isascii():
+        for _, finditer, repl, anchor in _BOILERPLATE:
+            if anchor in low:
+                result, low = _splice_out(result, low, finditer)
+        for _, finditer, repl, anchor in _INSTRUCTIONS:
+            if anchor in low:
+                result, low = _splice_out(result, low, finditer)
+    else:
+        for sub, _, repl, anchor in _BOILERPLATE:
+            if anchor in low:
+                result = sub(repl, result)
+
+        for sub, _, repl, anchor in _INSTRUCTIONS:
+            if anchor in low:
+                result = sub(repl, result)
+
+    result = _FILLERS.sub('', result)
+
+    for sub, repl in _REDUNDANT:
+        result = sub(repl, result)
+
+    result = _UNITS.sub(_units_repl, result)
+    for sub, repl in _STRUCTURAL:
+        result = sub(repl, result)
+
+    result = '\n'.join(' '.join(line.split()) for line in result.split('\n'))
+    result = _WS_PUNCT.sub(r'\1', result)
+    result = result.strip()
+
+    if result and result[0].isalpha():
+        result = result[0].upper() + result[1:]
+    result = _SENT_CAP.sub(_sent_cap_repl, result)
+
+    result += "\n\n[output_language: english]"
+    return result
@@ -3,192 +3,289 @@
 AGGRESSIVE optimization mode - maximum compression via regex only
 """
 
+import argparse
 import re
+from types import SimpleNamespace
+
+from _patterns import (
+    WS_CLEAN_AGGRESSIVE,
+    build_word_automaton,
+    capitalize_sentences as _capitalize_sentences,
+    drop_fillers,
+    drop_words_ac,
+    load_prompt as _load_prompt,
+    ws_clean_repl as _ws_clean_repl,
+)
+
+# All patterns are compiled once at module load so repeated calls skip the
+# re-cache lookup + compile dispatch entirely; the machinery shared with the
+# other generator scripts lives in _patterns.
+
+# Phase 1: Politeness markers
+_POLITENESS_WORDS = ('please', 'kindly')
+_POLITENESS_SET = frozenset(_POLITENESS_WORDS)
+
+# Phase 2: Aggressive boilerplate removal. Each pattern starts with a fixed
+# literal; the lowercased anchor gates the regex so absent phrases cost one
+# substring check instead of a full NFA scan.
+_BOILERPLATE_TABLE = [
+    (r"I would (really )?appreciate (it )?if you could\s*", "i would", ""),
+    (r"Thank you (so much )?in advance[^.!?]*[.!?]\s*", "thank you", ""),
+    (r"Could you\s+", "could you", ""),
+    (r"Would you\s+", "would you", ""),
+    (r"I want you to\s+", "i want you to", ""),
+    (r"I would like you to\s+", "i would like", ""),
+    (r"I need you to\s+", "i need you to", ""),
+    (r"take the time to\s+", "take the time", ""),
+]
+
+# Phase 3: ALL filler words
+_FILLER_WORDS = ['really', 'very', 'quite', 'just', 'actually', 'basically',
+                 'essentially', 'definitely', 'absolutely', 'certainly', 'carefully',
+                 'also', 'furthermore', 'moreover', 'indeed', 'clearly', 'obviously',
+                 'any', 'some']
+
+_FILLER_SET = frozenset(_FILLER_WORDS)
+
+# The fillers and politeness markers are plain literals, so a single
+# Aho-Corasick automaton scans for the whole set in one O(n) pass independent
+# of set size. Built once at import when pyahocorasick is available.
+_WORD_AUTOMATON = build_word_automaton(_FILLER_SET | _POLITENESS_SET)
+
+# Phase 4: Verbose phrase compression (aggressive)
+_COMPRESSION_TABLE = [
+    # Verbose explanations → concise
+    (r"Provide\s+a\s+detailed\s+explanation\s+of\s+", "Explain: "),
+    (r"Provide\s+a\s+detailed\s+explanation\s+", "Explain "),
+    (r"Provide\s+detailed\s+", ""),
+
+    # "what X does, how X works, and why" → "X: functionality, implementation, rationale"
+    (r"of\s+what\s+(?:the\s+)?code\s+does,?\s+how\s+it\s+works,?\s+and\s+why\s+it\s+was\s+implemented\s+(?:in\s+)?(?:this\s+)?(?:particular\s+)?(?:way\.?)?",
+     "functionality, implementation, rationale."),
+
+    # Look into X → Identify X
+    (r"Look\s+into\s+", "Identify: "),
+    (r"look\s+(?:for|at)\s+", "identify "),
+
+    # "bugs or issues that you might find" → "bugs"
+    (r"bugs?\s+or\s+issues\s+(?:that\s+you\s+might\s+find)?", "bugs"),
+    (r"problems?\s+or\s+issues", "issues"),
+
+    # "check for any X problems or areas where" → "X issues"
+    (r"and\s+check\s+for\s+performance\s+problems?\s+or\s+areas\s+where\s+(?:the\s+)?code\s+could\s+be\s+improved\s+or\s+optimized\.?",
+     "performance issues, improvements."),
+
+    # "Research and explain whether" → "Verify"
+    (r"Research\s+and\s+explain\s+whether\s+(?:this\s+)?code\s+follows\s+", "Verify "),
+    (r"research\s+and\s+explain\s+", "verify "),
+
+    # "best practices and coding standards" → "best practices"
+    (r"best\s+practices\s+and\s+coding\s+standards", "best practices"),
+
+    # Final cleanup sentence
+    (r"provide\s+suggestions\s+(?:on\s+how\s+)?(?:to\s+fix\s+)?(?:them)?", "suggest fixes"),
+
+    # Additional compressions
+    (r"this\s+code\s+snippet", "this code"),
+    (r"that\s+I'?m\s+working\s+on", ""),
+    (r"in\s+this\s+particular\s+way", ""),
+    (r"you\s+might\s+find", ""),
+]
+
+_COMPRESS_REPL = [r for _, r in _COMPRESSION_TABLE]
+
+
+def _compress_repl(m):
+    return _COMPRESS_REPL[int(m.lastgroup[1:])]
+
+
+def _compile_tables(ascii_flag):
+    """Compile the pattern tables with the given width flag.
+
+    re.ASCII switches \\b/\\s and case folding to the narrow 0-127 tables,
+    skipping the Unicode property machinery; only safe when the input is
+    known ASCII, so a Unicode twin is kept for the rare non-ASCII prompt.
+    """
+    ci = re.IGNORECASE | ascii_flag
+    return SimpleNamespace(
+        # Loop tables store the bound sub methods directly — no attribute
+        # lookup per pattern per call.
+        # Phase 1 fallback (the automaton path is preferred when available)
+        politeness=[re.compile(r'\b' + w + r'\b\s*', ci).sub for w in _POLITENESS_WORDS],
+        boilerplate=[(re.compile(p, ci).sub, a, r) for p, a, r in _BOILERPLATE_TABLE],
+        # All compressions are disjoint and anchored on distinct keywords, so
+        # they fuse into one alternation swept in a single scan; m.lastgroup
+        # indexes the replacement table.
+        compress_re=re.compile(
+            '|'.join(f'(?P<g{i}>{p})' for i, (p, _) in enumerate(_COMPRESSION_TABLE)),
+            ci
+        ),
+        # Kept out of the fused alternation: in the sequential pipeline the
+        # "Provide detailed" and "problems or issues" patterns always rewrite
+        # the interior of this sentence before it is tried, so it must stay a
+        # later pass — fused, it would win leftmost and change the output.
+        suggest_sentence=re.compile(
+            r"If\s+you\s+find\s+problems?\s+or\s+issues?,?\s+provide\s+detailed\s+suggestions\s+on\s+how\s+to\s+fix\s+them\.?",
+            ci
+        ),
+        # Phase 5: Colon-based compression for lists
+        and_check=re.compile(r',?\s+and\s+check\s+', ascii_flag),
+        dot_identify=re.compile(r'\.\s+Identify:', ascii_flag),
+        # Phase 6: Article removal (aggressive)
+        a_detailed=re.compile(r'\ba\s+detailed\s+', ascii_flag),
+        the_code=re.compile(r'\bthe\s+code\b', ascii_flag),
+        # Phase 7: Whitespace cleanup fused into one pass. The old ' ([.,;:])'
+        # pass was subsumed by '\s+([.,;:])' — dead work, dropped.
+        ws_clean=re.compile(WS_CLEAN_AGGRESSIVE.pattern, ascii_flag),
+    )
+
+
+_ASCII_TABLES = _compile_tables(re.ASCII)
+_UNICODE_TABLES = _compile_tables(0)
+
 
 def aggressive_optimize(text):
-    """Apply aggressive compression patterns"""
+    """Apply aggressive compression patterns.
+
+    Returns (core, result): the compressed content, and the same content
+    with the language directive appended. Callers that need content-only
+    stats use core directly instead of splitting the directive back off.
+    """
     result = text
 
+    # One isascii() check picks the ASCII-narrow or Unicode pattern tables
+    # for the whole pipeline, and gates the automaton passes: drop_words_ac
+    # splices by indices found on a lowered copy, which only line up with
+    # the original when lower() is length-preserving, i.e. on ASCII.
+    is_ascii = text.isascii()
+    t = _ASCII_TABLES if is_ascii else _UNICODE_TABLES
+
     # Phase 1: Remove ALL politeness markers
-    result = re.sub(r'(?i)\bplease\b\s*', '', result)
-    result = re.sub(r'(?i)\bkindly\b\s*', '', result)
-
-    # Phase 2: Aggressive boilerplate removal
-    boilerplate = [
-        (r"(?i)I would (really )?appreciate (it )?if you could\s*", ""),
-        (r"(?i)Thank you (so much )?in advance[^.!?]*[.!?]\s*", ""),
-        (r"(?i)Could you\s+", ""),
-        (r"(?i)Would you\s+", ""),
-        (r"(?i)I want you to\s+", ""),
-        (r"(?i)I would like you to\s+", ""),
-        (r"(?i)I need you to\s+", ""),
-        (r"(?i)take the time to\s+", ""),
-    ]
-
-    for pattern, repl in boilerplate:
-        result = re.sub(pattern, repl, result)
-
-    # Phase 3: ALL filler words
-    fillers = ['really', 'very', 'quite', 'just', 'actually', 'basically',
-               'essentially', 'definitely', 'absolutely', 'certainly', 'carefully',
-               'also', 'furthermore', 'moreover', 'indeed', 'clearly', 'obviously',
-               'any', 'some']
-
-    for filler in fillers:
-        result = re.sub(r'(?i)\b' + filler + r'\b\s*', '', result)
-
-    # Phase 4: Verbose phrase compression (aggressive)
-    compressions = [
-        # Verbose explanations → concise
-        (r"(?i)Provide\s+a\s+detailed\s+explanation\s+of\s+", "Explain: "),
-        (r"(?i)Provide\s+a\s+detailed\s+explanation\s+", "Explain "),
-        (r"(?i)Provide\s+detailed\s+", ""),
-
-        # "what X does, how X works, and why" → "X: functionality, implementation, rationale"
-        (r"(?i)of\s+what\s+(?:the\s+)?code\s+does,?\s+how\s+it\s+works,?\s+and\s+why\s+it\s+was\s+implemented\s+(?:in\s+)?(?:this\s+)?(?:particular\s+)?(?:way\.?)?",
-         "functionality, implementation, rationale."),
-
-        # Look into X → Identify X
-        (r"(?i)Look\s+into\s+", "Identify: "),
-        (r"(?i)look\s+(?:for|at)\s+", "identify "),
-
-        # "bugs or issues that you might find" → "bugs"
-        (r"(?i)bugs?\s+or\s+issues\s+(?:that\s+you\s+might\s+find)?", "bugs"),
-        (r"(?i)problems?\s+or\s+issues", "issues"),
-
-        # "check for any X problems or areas where" → "X issues"
-        (r"(?i)and\s+check\s+for\s+performance\s+problems?\s+or\s+areas\s+where\s+(?:the\s+)?code\s+could\s+be\s+improved\s+or\s+optimized\.?",
-         "performance issues, improvements."),
-
-        # "Research and explain whether" → "Verify"
-        (r"(?i)Research\s+and\s+explain\s+whether\s+(?:this\s+)?code\s+follows\s+", "Verify "),
-        (r"(?i)research\s+and\s+explain\s+", "verify "),
-
-        # "best practices and coding standards" → "best practices"
-        (r"(?i)best\s+practices\s+and\s+coding\s+standards", "best practices"),
-
-        # Final cleanup sentence
-        (r"(?i)If\s+you\s+find\s+problems?\s+or\s+issues?,?\s+provide\s+detailed\s+suggestions\s+on\s+how\s+to\s+fix\s+them\.?",
-         "Suggest fixes."),
-        (r"(?i)provide\s+suggestions\s+(?:on\s+how\s+)?(?:to\s+fix\s+)?(?:them)?", "suggest fixes"),
-
-        # Additional compressions
-        (r"(?i)this\s+code\s+snippet", "this code"),
-        (r"(?i)that\s+I'?m\s+working\s+on", ""),
-        (r"(?i)in\s+this\s+particular\s+way", ""),
-        (r"(?i)you\s+might\s+find", ""),
-    ]
-
-    for pattern, repl in compressions:
-        result = re.sub(pattern, repl, result)
+    if _WORD_AUTOMATON is not None and is_ascii:
+        result = drop_words_ac(result, _POLITENESS_SET, _WORD_AUTOMATON)
+    else:
+        for sub in t.politeness:
+            result = sub('', result)
+
+    # Phase 2: Aggressive boilerplate removal. One lowercased snapshot gates
+    # all anchors — the subs only ever delete text, so a stale snapshot can
+    # only let a no-op sub through, never skip a live one.
+    low = result.lower()
+    for sub, anchor, repl in t.boilerplate:
+        if anchor in low:
+            result = sub(repl, result)
+
+    # Phase 3: ALL filler words (single automaton or token pass, regex-free)
+    if _WORD_AUTOMATON is not None and is_ascii:
+        result = drop_words_ac(result, _FILLER_SET, _WORD_AUTOMATON)
+    else:
+        result = drop_fillers(result, _FILLER_SET)
+
+    # Phase 4: Verbose phrase compression (aggressive, one fused scan).
+    # The suggest-fixes sentence is anchor-gated: cheaper than its NFA run.
+    result = t.compress_re.sub(_compress_repl, result)
+    if "if you find" in result.lower():
+        result = t.suggest_sentence.sub("Suggest fixes.", result)
 
     # Phase 5: Colon-based compression for lists
     # "Identify: bugs, and check performance issues" → "Identify: bugs, performance issues"
-    result = re.sub(r',?\s+and\s+check\s+', ', ', result)
-    result = re.sub(r'\.\s+Identify:', '. Identify:', result)
+    result = t.and_check.sub(', ', result)
+    result = t.dot_identify.sub('. Identify:', result)
 
     # Phase 6: Article removal (aggressive)
-    result = re.sub(r'\ba\s+detailed\s+', '', result)
-    result = re.sub(r'\bthe\s+code\b', 'code', result)
+    result = t.a_detailed.sub('', result)
+    result = t.the_code.sub('code', result)
 
-    # Phase 7: Clean whitespace
-    result = re.sub(r'  +', ' ', result)
-    result = re.sub(r' ([.,;:])', r'\1', result)
-    result = re.sub(r'\s+([.,;:])', r'\1', result)
+    # Phase 7: Clean whitespace (single fused pass)
+    result = t.ws_clean.sub(_ws_clean_repl, result)
     result = result.strip()
 
-    # Phase 8: Capitalize sentences
-    def capitalize_sentences(text):
-        if not text:
-            return text
-
-        # Capitalize first character
-        if text[0].isalpha():
-            text = text[0].upper() + text[1:]
-
-        # Capitalize after sentence-ending punctuation
-        result = []
-        i = 0
-        while i < len(text):
-            result.append(text[i])
-
-            if text[i] in '.!?' and i + 1 < len(text):
-                # Skip whitespace
-                j = i + 1
-                while j < len(text) and text[j].isspace():
-                    result.append(text[j])
-                    j += 1
-
-                # Capitalize next letter
-                if j < len(text) and text[j].isalpha():
-                    result.append(text[j].upper())
-                    i = j
-                else:
-                    i = j - 1
-
-            i += 1
-
-        return ''.join(result)
-
-    result = capitalize_sentences(result)
+    # Phase 8: Capitalize sentences (jitted byte kernel or single regex pass)
+    core = _capitalize_sentences(result)
 
     # Add language directive
-    result += "\n\n[output_language: english]"
-
-    return result
-
-# Test on example prompt
-with open('examples/verbose_prompt.txt', 'r') as f:
-    original = f.read().strip()
+    return core, core + "\n\n[output_language: english]"
 
-print("=" * 100)
-print("AGGRESSIVE OPTIMIZATION MODE - MAXIMUM COMPRESSION")
-print("=" * 100)
 
-optimized = aggressive_optimize(original)
+def optimize_all(texts):
+    """Optimize a batch of prompts, reusing the precompiled pattern tables."""
+    return [aggressive_optimize(text)[1] for text in texts]
 
-# Save
-with open('examples/optimized_aggressive.txt', 'w') as f:
-    f.write(optimized)
 
-print("\n✓ Saved to: examples/optimized_aggressive.txt")
-
-# Count words/tokens
 def count_words(text):
     return len(text.split())
 
+
 def estimate_tokens(text):
     words = count_words(text)
-    punct = len(re.findall(r'[.,!?;:]', text))
+    # str.count per punctuation char beats a regex findall: no match-list
+    # allocation and no regex engine involvement.
+    punct = sum(text.count(c) for c in '.,!?;:')
     return int(words * 0.75 + punct * 0.3)
 
-orig_words = count_words(original)
-opt_words = count_words(optimized.split('\n\n[output_language')[0])
-
-orig_tokens = estimate_tokens(original)
-opt_tokens = estimate_tokens(optimized.split('\n\n[output_language')[0])
-
-print(f"\nOriginal: {orig_words} words (~{orig_tokens} tokens)")
-print(f"Optimized: {opt_words} words (~{opt_tokens} tokens)")
-print(f"Savings: {orig_words - opt_words} words ({(orig_words - opt_words) / orig_words * 100:.1f}%)")
-print(f"         ~{orig_tokens - opt_tokens} tokens ({(orig_tokens - opt_tokens) / orig_tokens * 100:.1f}%)")
-
-print("\n" + "-" * 100)
-print("OPTIMIZED OUTPUT:")
-print("-" * 100)
-print(optimized)
-print("-" * 100)
-
-# Quality check
-issues = []
-lines = optimized.split('\n')
-for i, line in enumerate(lines[:5]):
-    line = line.strip()
-    if line and 'please' in line.lower():
-        issues.append(f"❌ Line {i+1} still contains 'please': {line}")
-
-if not issues:
-    print("\n✅ Quality check passed - no 'please' found")
-else:
-    for issue in issues:
-        print(issue)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Aggressively compress a prompt with regex-only patterns"
+    )
+    parser.add_argument(
+        "input",
+        nargs="?",
+        default="examples/verbose_prompt.txt",
+        help="Prompt file to optimize (default: examples/verbose_prompt.txt)"
+    )
+    parser.add_argument(
+        "--output",
+        default="examples/optimized_aggressive.txt",
+        help="Where to write the optimized prompt"
+    )
+    args = parser.parse_args(argv)
+
+    original = _load_prompt(args.input)
+
+    print("=" * 100)
+    print("AGGRESSIVE OPTIMIZATION MODE - MAXIMUM COMPRESSION")
+    print("=" * 100)
+
+    core, optimized = aggressive_optimize(original)
+
+    # Save
+    with open(args.output, 'w') as f:
+        f.write(optimized)
+
+    print(f"\n✓ Saved to: {args.output}")
+
+    orig_words = count_words(original)
+    opt_words = count_words(core)
+
+    orig_tokens = estimate_tokens(original)
+    opt_tokens = estimate_tokens(core)
+
+    print(f"\nOriginal: {orig_words} words (~{orig_tokens} tokens)")
+    print(f"Optimized: {opt_words} words (~{opt_tokens} tokens)")
+    print(f"Savings: {orig_words - opt_words} words ({(orig_words - opt_words) / orig_words * 100:.1f}%)")
+    print(f"         ~{orig_tokens - opt_tokens} tokens ({(orig_tokens - opt_tokens) / orig_tokens * 100:.1f}%)")
+
+    print("\n" + "-" * 100)
+    print("OPTIMIZED OUTPUT:")
+    print("-" * 100)
+    print(optimized)
+    print("-" * 100)
+
+    # Quality check
+    issues = []
+    lines = optimized.split('\n')
+    for i, line in enumerate(lines[:5]):
+        line = line.strip()
+        if line and 'please' in line.lower():
+            issues.append(f"❌ Line {i+1} still contains 'please': {line}")
+
+    if not issues:
+        print("\n✅ Quality check passed - no 'please' found")
+    else:
+        for issue in issues:
+            print(issue)
+
+
+if __name__ == '__main__':
+    main()
@@ -5,166 +5,205 @@ Matches Rust pattern order exactly
 """
 
 import re
-
-def optimize_aggressive_v03(text):
-    """Apply v0.3 aggressive patterns in correct order"""
-    result = text
-
-    # Phase 1: Remove standalone politeness FIRST (before other patterns)
-    result = re.sub(r'(?i)\bplease\b\s+', '', result)
-    result = re.sub(r'(?i)\bkindly\b\s+', '', result)
-
-    # Phase 2: Boilerplate removal (high-level phrases)
-    result = re.sub(r"(?i)Thank you (so much )?in advance for .+?[.!]", "", result)
-    result = re.sub(r"(?i)I would (really )?appreciate (it )?if you could\s*", "", result)
-    result = re.sub(r"(?i)Could you\s+", "", result)
-    result = re.sub(r"(?i)I want you to\s+", "", result)
-    result = re.sub(r"(?i)I would (also )?like you to\s+", "", result)
-    result = re.sub(r"(?i)\bmake sure to\s+", "", result)
-    result = re.sub(r"(?i)take the time to\s+", "", result)
-
-    # Phase 3: AGGRESSIVE v0.3 complete sentence compressions (MOST SPECIFIC FIRST)
-    # These must run BEFORE filler word removal
-
-    # Complete explanation pattern
-    result = re.sub(
-        r"(?i)Provide\s+a\s+(?:very\s+)?detailed\s+(?:and\s+thorough\s+)?explanation\s+of\s+what\s+(?:the\s+)?code\s+does,?\s+how\s+it\s+works,?\s+and\s+why\s+it\s+was\s+implemented(?:\s+in\s+this\s+particular\s+way)?\.?",
-        "Explain: functionality, implementation, rationale.",
-        result
-    )
-
-    # Combined bugs + performance check
-    result = re.sub(
-        r"(?i)look\s+into\s+(?:any\s+)?(?:potential\s+)?bugs?\s+or\s+issues\s+(?:that\s+you\s+might\s+find)?,?\s+and\s+(?:also\s+)?check\s+for\s+(?:any\s+)?performance\s+problems?\s+or\s+areas\s+where\s+(?:the\s+)?code\s+could\s+be\s+improved\s+or\s+optimized\.?",
-        "Identify: bugs, performance issues, improvements.",
-        result
-    )
-
-    # Research and explain best practices
-    result = re.sub(
-        r"(?i)Research\s+and\s+explain\s+whether\s+(?:this\s+)?code\s+follows\s+best\s+practices\s+and\s+coding\s+standards\.?",
-        "Verify best practices.",
-        result
-    )
-
-    # Final suggestion sentence
-    result = re.sub(
-        r"(?i)If\s+you\s+find\s+(?:any\s+)?problems?\s+or\s+issues?,?\s+(?:please\s+)?provide\s+detailed\s+suggestions\s+on\s+how\s+to\s+fix\s+them\.?",
-        "Suggest fixes.",
-        result
+from types import SimpleNamespace
+
+from _patterns import (
+    WS_CLEAN_V03,
+    capitalize_sentences as _capitalize_sentences,
+    filler_alternation,
+    load_prompt as _load_prompt,
+    ws_clean_repl as _ws_clean_repl,
+)
+
+# All patterns compiled once at module load; whitespace/capitalization
+# helpers come precompiled from _patterns.
+
+# Phase 2: Boilerplate removal (high-level phrases). Each pattern starts with
+# a fixed literal; the lowercased anchor gates the regex so absent phrases
+# cost one substring check instead of a full NFA scan.
+_BOILERPLATE_TABLE = [
+    (r"Thank you (so much )?in advance for .+?[.!]", "thank you"),
+    (r"I would (really )?appreciate (it )?if you could\s*", "i would"),
+    (r"Could you\s+", "could you"),
+    (r"I want you to\s+", "i want you to"),
+    (r"I would (also )?like you to\s+", "i would"),
+    (r"\bmake sure to\s+", "make sure to"),
+    (r"take the time to\s+", "take the time"),
+]
+
+# Phase 4: Filler words
+_FILLER_WORDS = ['really', 'very', 'quite', 'carefully', 'also', 'any', 'potential']
+
+
+def _compile_tables(ascii_flag):
+    """Compile the pattern tables with the given width flag.
+
+    re.ASCII switches \\b/\\s and case folding to the narrow 0-127 tables;
+    only safe when the input is known ASCII, so a Unicode twin is kept for
+    the rare non-ASCII prompt.
+    """
+    ci = re.IGNORECASE | ascii_flag
+    return SimpleNamespace(
+        # Loop tables store the bound sub methods directly — no attribute
+        # lookup per pattern per call.
+        # Phase 1: Standalone politeness
+        politeness=[
+            re.compile(r'\bplease\b\s+', ci).sub,
+            re.compile(r'\bkindly\b\s+', ci).sub,
+        ],
+        boilerplate=[(re.compile(p, ci).sub, a) for p, a in _BOILERPLATE_TABLE],
+        # Phase 3: AGGRESSIVE v0.3 complete sentence compressions (MOST SPECIFIC FIRST)
+        explanation=re.compile(
+            r"Provide\s+a\s+(?:very\s+)?detailed\s+(?:and\s+thorough\s+)?explanation\s+of\s+what\s+(?:the\s+)?code\s+does,?\s+how\s+it\s+works,?\s+and\s+why\s+it\s+was\s+implemented(?:\s+in\s+this\s+particular\s+way)?\.?",
+            ci
+        ),
+        bugs_perf=re.compile(
+            r"look\s+into\s+(?:any\s+)?(?:potential\s+)?bugs?\s+or\s+issues\s+(?:that\s+you\s+might\s+find)?,?\s+and\s+(?:also\s+)?check\s+for\s+(?:any\s+)?performance\s+problems?\s+or\s+areas\s+where\s+(?:the\s+)?code\s+could\s+be\s+improved\s+or\s+optimized\.?",
+            ci
+        ),
+        best_practices=re.compile(
+            r"Research\s+and\s+explain\s+whether\s+(?:this\s+)?code\s+follows\s+best\s+practices\s+and\s+coding\s+standards\.?",
+            ci
+        ),
+        suggest_fixes=re.compile(
+            r"If\s+you\s+find\s+(?:any\s+)?problems?\s+or\s+issues?,?\s+(?:please\s+)?provide\s+detailed\s+suggestions\s+on\s+how\s+to\s+fix\s+them\.?",
+            ci
+        ),
+        # Phase 4: one fused alternation (longest-first) replaces the per-word scan loop
+        filler_re=filler_alternation(_FILLER_WORDS, ci),
+        # Phase 5: Context removals
+        working_on=re.compile(r"that\s+I'?m\s+working\s+on", ci),
+        code_snippet=re.compile(r"this\s+code\s+snippet", ci),
+        # Phase 6: Whitespace cleanup fused into one pass
+        ws_clean=re.compile(WS_CLEAN_V03.pattern, ascii_flag),
     )
 
-    # Phase 4: Filler word removal (after big compressions)
-    fillers = ['really', 'very', 'quite', 'carefully', 'also', 'any', 'potential']
-    for filler in fillers:
-        result = re.sub(r'(?i)\b' + filler + r'\b\s*', '', result)
-
-    # Phase 5: Context removals
-    result = re.sub(r"(?i)that\s+I'?m\s+working\s+on", "", result)
-    result = re.sub(r"(?i)this\s+code\s+snippet", "this code", result)
-
-    # Phase 6: Clean whitespace
-    result = re.sub(r'  +', ' ', result)
-    result = re.sub(r' ([.,;:])', r'\1', result)
-    result = re.sub(r'\s+,', ',', result)
-    result = result.strip()
 
-    # Phase 7: Capitalize
-    def capitalize_sentences(text):
-        if not text or not text[0].isalpha():
-            if text:
-                text = text[0].upper() + text[1:] if len(text) > 1 else text
-        elif text[0].islower():
-            text = text[0].upper() + text[1:]
+_ASCII_TABLES = _compile_tables(re.ASCII)
+_UNICODE_TABLES = _compile_tables(0)
 
-        result = []
-        i = 0
-        while i < len(text):
-            result.append(text[i])
+# Phase 7: Sentence capitalization (_capitalize_sentences, shared).
 
-            if text[i] in '.!?' and i + 1 < len(text):
-                j = i + 1
-                while j < len(text) and text[j].isspace():
-                    result.append(text[j])
-                    j += 1
 
-                if j < len(text) and text[j].isalpha() and text[j].islower():
-                    result.append(text[j].upper())
-                    i = j
-                elif j < len(text):
-                    result.append(text[j])
-                    i = j
-                else:
-                    i = j - 1
-
-            i += 1
+def count_words(text):
+    return len(text.split())
 
-        return ''.join(result)
 
-    result = capitalize_sentences(result)
-    result += "\n\n[output_language: english]"
+def estimate_tokens(text):
+    words = count_words(text)
+    # str.count per punctuation char beats a regex findall: no match-list
+    # allocation and no regex engine involvement.
+    punct = sum(text.count(c) for c in '.,!?;:')
+    return int(words * 0.75 + punct * 0.3)
 
-    return result
 
-# Test
-with open('examples/verbose_prompt.txt', 'r') as f:
-    original = f.read().strip()
+def optimize_aggressive_v03(text):
+    """Apply v0.3 aggressive patterns in correct order.
 
-print("=" * 100)
-print("FINAL v0.3 AGGRESSIVE OPTIMIZATION")
-print("=" * 100)
+    Returns (core, result): the compressed content, and the same content
+    with the language directive appended.
+    """
+    result = text
 
-optimized = optimize_aggressive_v03(original)
+    # One isascii() check picks the ASCII-narrow or Unicode pattern tables
+    # for the whole pipeline.
+    t = _ASCII_TABLES if text.isascii() else _UNICODE_TABLES
 
-# Save
-with open('examples/optimized.txt', 'w') as f:
-    f.write(optimized)
+    # Phase 1: Remove standalone politeness FIRST (before other patterns)
+    for sub in t.politeness:
+        result = sub('', result)
+
+    # Phase 2: Boilerplate removal (high-level phrases). One lowercased
+    # snapshot gates every anchor — these subs only delete text and none of
+    # the Phase 3 replacements contains another anchor, so a stale snapshot
+    # can only let a no-op sub through, never skip a live one.
+    low = result.lower()
+    for sub, anchor in t.boilerplate:
+        if anchor in low:
+            result = sub('', result)
 
-print("\n✓ Saved to: examples/optimized.txt")
+    # Phase 3: AGGRESSIVE v0.3 complete sentence compressions (MOST SPECIFIC FIRST)
+    # These must run BEFORE filler word removal; same anchor gating as Phase 2
+    if "provide" in low:
+        result = t.explanation.sub("Explain: functionality, implementation, rationale.", result)
+    if "look into" in low:
+        result = t.bugs_perf.sub("Identify: bugs, performance issues, improvements.", result)
+    if "research" in low:
+        result = t.best_practices.sub("Verify best practices.", result)
+    if "if you find" in low:
+        result = t.suggest_fixes.sub("Suggest fixes.", result)
+
+    # Phase 4: Filler word removal (after big compressions, one fused scan)
+    result = t.filler_re.sub('', result)
 
-# Stats
-def count_words(text):
-    return len(text.split())
+    # Phase 5: Context removals
+    result = t.working_on.sub('', result)
+    result = t.code_snippet.sub('this code', result)
 
-def estimate_tokens(text):
-    words = count_words(text)
-    punct = len(re.findall(r'[.,!?;:]', text))
-    return int(words * 0.75 + punct * 0.3)
+    # Phase 6: Clean whitespace (single fused pass)
+    result = t.ws_clean.sub(_ws_clean_repl, result)
+    result = result.strip()
 
-orig_words = count_words(original)
-opt_content = optimized.split('\n\n[output_language')[0]
-opt_words = count_words(opt_content)
-
-orig_tokens = estimate_tokens(original)
-opt_tokens = estimate_tokens(opt_content)
-
-print(f"\nOriginal: {orig_words} words (~{orig_tokens} tokens)")
-print(f"Optimized: {opt_words} words (~{opt_tokens} tokens)")
-print(f"Savings: {orig_words - opt_words} words ({(orig_words - opt_words) / orig_words * 100:.1f}%)")
-print(f"         ~{orig_tokens - opt_tokens} tokens ({(orig_tokens - opt_tokens) / orig_tokens * 100:.1f}%)")
-
-print("\n" + "-" * 100)
-print("FINAL OUTPUT:")
-print("-" * 100)
-print(optimized)
-print("-" * 100)
-
-# Quality checks
-checks = []
-if 'please' in optimized.lower():
-    checks.append("❌ Contains 'please'")
-if opt_content[0].islower():
-    checks.append("❌ Starts with lowercase")
-if 'for your help' in optimized.lower():
-    checks.append("❌ Orphaned phrase")
-if 'that you might find' in optimized.lower():
-    checks.append("❌ Contains 'that you might find'")
-if 'in this particular way' in optimized.lower():
-    checks.append("❌ Contains 'in this particular way'")
-
-if not checks:
-    print("\n✅ All quality checks passed - no 'please', proper capitalization, no orphans")
-else:
-    print("\nQuality Issues:")
-    for check in checks:
-        print(f"  {check}")
+    # Phase 7: Capitalize (jitted byte kernel or single regex pass)
+    core = _capitalize_sentences(result)
+
+    return core, core + "\n\n[output_language: english]"
+
+def main():
+    # Test
+    original = _load_prompt('examples/verbose_prompt.txt')
+
+    print("=" * 100)
+    print("FINAL v0.3 AGGRESSIVE OPTIMIZATION")
+    print("=" * 100)
+
+    opt_content, optimized = optimize_aggressive_v03(original)
+
+    # Save
+    with open('examples/optimized.txt', 'w') as f:
+        f.write(optimized)
+
+    print("\n✓ Saved to: examples/optimized.txt")
+
+    # Stats
+    orig_words = count_words(original)
+    opt_words = count_words(opt_content)
+
+    orig_tokens = estimate_tokens(original)
+    opt_tokens = estimate_tokens(opt_content)
+
+    print(f"\nOriginal: {orig_words} words (~{orig_tokens} tokens)")
+    print(f"Optimized: {opt_words} words (~{opt_tokens} tokens)")
+    print(f"Savings: {orig_words - opt_words} words ({(orig_words - opt_words) / orig_words * 100:.1f}%)")
+    print(f"         ~{orig_tokens - opt_tokens} tokens ({(orig_tokens - opt_tokens) / orig_tokens * 100:.1f}%)")
+
+    print("\n" + "-" * 100)
+    print("FINAL OUTPUT:")
+    print("-" * 100)
+    print(optimized)
+    print("-" * 100)
+
+    # Quality checks (lowercase once, not per check)
+    low = optimized.lower()
+    checks = []
+    if 'please' in low:
+        checks.append("❌ Contains 'please'")
+    if opt_content[0].islower():
+        checks.append("❌ Starts with lowercase")
+    if 'for your help' in low:
+        checks.append("❌ Orphaned phrase")
+    if 'that you might find' in low:
+        checks.append("❌ Contains 'that you might find'")
+    if 'in this particular way' in low:
+        checks.append("❌ Contains 'in this particular way'")
+
+    if not checks:
+        print("\n✅ All quality checks passed - no 'please', proper capitalization, no orphans")
+    else:
+        print("\nQuality Issues:")
+        for check in checks:
+            print(f"  {check}")
+
+
+if __name__ == '__main__':
+    main()
@@ -5,162 +5,183 @@ Manual simulation of prompt optimization to verify behavior
 
 import re
 
-# Read the verbose prompt
-with open("examples/verbose_prompt.txt", "r") as f:
-    original = f.read().strip()
-
-print("=" * 100)
-print("MANUAL OPTIMIZATION SIMULATION")
-print("=" * 100)
-print(f"\nORIGINAL PROMPT ({len(original)} chars):")
-print(original)
-print()
-
-# Simulate the boilerplate patterns from patterns.rs
-boilerplate_patterns = [
-    (r"(?i)I would (really )?appreciate (it )?if you could\s*", "", "Boilerplate removal"),
-    (r"(?i)Please make sure to\s*", "", "Redundant instruction"),
-    (r"(?i)Thank you (so much )?in advance for .+?[.!]", "", "Complete gratitude sentence"),
-    (r"(?i)Thank you (so much )?in advance\s*", "", "Partial gratitude"),
-]
-
-# Apply boilerplate removals
-result = original
-optimizations = []
-
-for pattern, replacement, reasoning in boilerplate_patterns:
-    matches = list(re.finditer(pattern, result))
-    for match in matches:
-        old_text = match.group()
-        result = result[:match.start()] + replacement + result[match.end():]
-        optimizations.append({
-            'type': 'Boilerplate',
-            'original': old_text,
-            'replacement': replacement,
-            'reasoning': reasoning,
-            'position': match.start()
-        })
-        print(f"✓ Removed: '{old_text.strip()}' ({reasoning})")
-        break  # Re-search after each replacement
+from _patterns import (
+    WS_CLEAN_BASIC as _WS_CLEAN,
+    first_n_sentence_starts,
+    load_prompt as _load_prompt,
+    ws_clean_repl as _ws_clean_repl,
+)
+
+# Simulate the boilerplate patterns from patterns.rs (compiled once at load;
+# tables store the bound subn methods — no attribute lookup per pattern)
+boilerplate_patterns = [(re.compile(p, re.IGNORECASE).subn, r, d) for p, r, d in [
+    (r"I would (really )?appreciate (it )?if you could\s*", "", "Boilerplate removal"),
+    (r"Please make sure to\s*", "", "Redundant instruction"),
+    (r"Thank you (so much )?in advance for .+?[.!]", "", "Complete gratitude sentence"),
+    (r"Thank you (so much )?in advance\s*", "", "Partial gratitude"),
+]]
 
 # Filler words
-filler_patterns = [
-    (r"(?i)\breally\b", ""),
-    (r"(?i)\bvery\b", ""),
-    (r"(?i)\bcarefully\b", ""),
-    (r"(?i)\balso\b", ""),
-]
-
-for pattern, replacement in filler_patterns:
-    matches = list(re.finditer(pattern, result))
-    if matches:
-        for match in matches:
+filler_patterns = [(re.compile(p, re.IGNORECASE).subn, r) for p, r in [
+    (r"\breally\b", ""),
+    (r"\bvery\b", ""),
+    (r"\bcarefully\b", ""),
+    (r"\balso\b", ""),
+]]
+
+# Instruction compression
+instruction_patterns = [(re.compile(p, re.IGNORECASE).subn, r) for p, r in [
+    (r"I want you to\s+", ""),
+    (r"I would like you to\s+", ""),
+    (r"I would also like you to\s+", ""),
+    (r"take the time to\s+", ""),
+]]
+
+# Whitespace cleanup comes precompiled from _patterns (_WS_CLEAN). The
+# sentence capitalizer below deliberately keeps its own split-based
+# implementation: it only fires after punctuation *followed by whitespace*,
+# unlike the shared regex ('\s*'), and the simulation should keep mirroring
+# the Rust behavior exactly.
+_SENT_SPLIT_KEEP = re.compile(r'([.!?]\s+)')
+
+
+def capitalize_sentences(text):
+    # Simple implementation
+    sentences = _SENT_SPLIT_KEEP.split(text)
+    capitalized = []
+    for i, part in enumerate(sentences):
+        if i % 2 == 0 and part:  # Sentence content, not separator
+            part = part[0].upper() + part[1:] if part else part
+        capitalized.append(part)
+    return ''.join(capitalized)
+
+
+def main():
+    # Read the verbose prompt
+    original = _load_prompt("examples/verbose_prompt.txt")
+
+    print("=" * 100)
+    print("MANUAL OPTIMIZATION SIMULATION")
+    print("=" * 100)
+    print(f"\nORIGINAL PROMPT ({len(original)} chars):")
+    print(original)
+    print()
+
+    # Apply boilerplate removals
+    result = original
+    optimizations = []
+
+    # subn with count=1 keeps the "first occurrence only" semantics of the old
+    # slice-splice loop, but lets the regex engine build the new string in one
+    # linear pass instead of rebuilding result[:start] + repl + result[end:].
+    for subn, replacement, reasoning in boilerplate_patterns:
+        hits = []
+        result, n = subn(lambda m: hits.append(m) or replacement, result, 1)
+        if n:
+            match = hits[0]
             old_text = match.group()
-            result = result[:match.start()] + replacement + result[match.end():]
+            optimizations.append({
+                'type': 'Boilerplate',
+                'original': old_text,
+                'replacement': replacement,
+                'reasoning': reasoning,
+                'position': match.start()
+            })
+            print(f"✓ Removed: '{old_text.strip()}' ({reasoning})")
+
+    for subn, replacement in filler_patterns:
+        hits = []
+        result, n = subn(lambda m: hits.append(m) or replacement, result, 1)
+        if n:
+            old_text = hits[0].group()
             optimizations.append({
                 'type': 'Filler',
                 'original': old_text,
                 'replacement': replacement
             })
             print(f"✓ Removed filler: '{old_text}'")
-            break
 
-# Instruction compression
-instruction_patterns = [
-    (r"(?i)I want you to\s+", ""),
-    (r"(?i)I would like you to\s+", ""),
-    (r"(?i)I would also like you to\s+", ""),
-    (r"(?i)take the time to\s+", ""),
-]
-
-for pattern, replacement in instruction_patterns:
-    matches = list(re.finditer(pattern, result))
-    if matches:
-        for match in matches:
-            old_text = match.group()
-            result = result[:match.start()] + replacement + result[match.end():]
+    # Instruction compression
+    for subn, replacement in instruction_patterns:
+        hits = []
+        result, n = subn(lambda m: hits.append(m) or replacement, result, 1)
+        if n:
+            old_text = hits[0].group()
             optimizations.append({
                 'type': 'Instruction',
                 'original': old_text,
                 'replacement': replacement
             })
             print(f"✓ Compressed instruction: '{old_text.strip()}'")
-            break
-
-# Clean whitespace
-result = re.sub(r'  +', ' ', result)
-result = re.sub(r' ([.,!?])', r'\1', result)
-result = result.strip()
-
-# Capitalize sentences
-def capitalize_sentences(text):
-    # Simple implementation
-    sentences = re.split(r'([.!?]\s+)', text)
-    capitalized = []
-    for i, part in enumerate(sentences):
-        if i % 2 == 0 and part:  # Sentence content, not separator
-            part = part[0].upper() + part[1:] if part else part
-        capitalized.append(part)
-    return ''.join(capitalized)
 
-result = capitalize_sentences(result)
-
-# Add language directive
-result += "\n\n[output_language: english]"
-
-print()
-print("=" * 100)
-print(f"OPTIMIZED PROMPT ({len(result)} chars):")
-print("=" * 100)
-print(result)
-print()
-print("=" * 100)
-print("ISSUES TO CHECK:")
-print("=" * 100)
-
-issues = []
-
-# Check for orphaned phrases
-orphaned_phrases = ["for your help with this", "for your", "for this"]
-for phrase in orphaned_phrases:
-    if phrase in result.lower():
-        issues.append(f"❌ Orphaned phrase found: '{phrase}'")
-
-# Check for lowercase sentence starts
-lines = result.split('\n')
-for i, line in enumerate(lines):
-    line = line.strip()
-    if line and line[0].islower() and line[0].isalpha():
-        issues.append(f"❌ Line {i+1} starts with lowercase: '{line[:30]}...'")
-
-# Check for proper capitalization after periods
-sentences = re.split(r'[.!?]\s+', result)
-for i, sent in enumerate(sentences[1:], 1):  # Skip first
-    if sent and sent[0].islower() and sent[0].isalpha():
-        issues.append(f"❌ Sentence {i+1} not capitalized: '{sent[:30]}...'")
-
-if issues:
-    for issue in issues:
-        print(issue)
-else:
-    print("✓ No obvious issues found")
-
-print("=" * 100)
-
-# Compare with existing optimized.txt
-try:
-    with open("examples/optimized.txt", "r") as f:
-        existing_optimized = f.read().strip()
-
-    print("\nEXISTING optimized.txt file:")
-    print("-" * 100)
-    print(existing_optimized)
-    print("-" * 100)
-
-    if "for your help" in existing_optimized.lower():
-        print("\n⚠️  WARNING: Existing optimized.txt contains orphaned phrase!")
-    if existing_optimized.split('\n')[0][0].islower():
-        print("⚠️  WARNING: Existing optimized.txt starts with lowercase!")
-
-except FileNotFoundError:
-    print("\nNo existing optimized.txt found for comparison")
+    # Clean whitespace (single fused pass)
+    result = _WS_CLEAN.sub(_ws_clean_repl, result)
+    result = result.strip()
+
+    # Capitalize sentences
+    result = capitalize_sentences(result)
+
+    # Add language directive
+    result += "\n\n[output_language: english]"
+
+    print()
+    print("=" * 100)
+    print(f"OPTIMIZED PROMPT ({len(result)} chars):")
+    print("=" * 100)
+    print(result)
+    print()
+    print("=" * 100)
+    print("ISSUES TO CHECK:")
+    print("=" * 100)
+
+    issues = []
+
+    # Check for orphaned phrases (lowercase once, not per phrase)
+    result_low = result.lower()
+    orphaned_phrases = ["for your help with this", "for your", "for this"]
+    for phrase in orphaned_phrases:
+        if phrase in result_low:
+            issues.append(f"❌ Orphaned phrase found: '{phrase}'")
+
+    # Check for lowercase sentence starts
+    lines = result.split('\n')
+    for i, line in enumerate(lines):
+        line = line.strip()
+        if line and line[0].islower() and line[0].isalpha():
+            issues.append(f"❌ Line {i+1} starts with lowercase: '{line[:30]}...'")
+
+    # Check for proper capitalization after periods (single scan, early exit)
+    for i, pos in enumerate(first_n_sentence_starts(result), 1):  # Skip first
+        c = result[pos]
+        if c.islower() and c.isalpha():
+            issues.append(f"❌ Sentence {i+1} not capitalized: '{result[pos:pos + 30]}...'")
+
+    if issues:
+        for issue in issues:
+            print(issue)
+    else:
+        print("✓ No obvious issues found")
+
+    print("=" * 100)
+
+    # Compare with existing optimized.txt
+    try:
+        with open("examples/optimized.txt", "r") as f:
+            existing_optimized = f.read().strip()
+
+        print("\nEXISTING optimized.txt file:")
+        print("-" * 100)
+        print(existing_optimized)
+        print("-" * 100)
+
+        if "for your help" in existing_optimized.lower():
+            print("\n⚠️  WARNING: Existing optimized.txt contains orphaned phrase!")
+        if existing_optimized.split('\n')[0][0].islower():
+            print("⚠️  WARNING: Existing optimized.txt starts with lowercase!")
+
+    except FileNotFoundError:
+        print("\nNo existing optimized.txt found for comparison")
+
+
+if __name__ == '__main__':
+    main()
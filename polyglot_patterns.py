@@ -0,0 +1,42 @@
+#!/usr/bin/env python3
+"""
+Shared compiled pattern tables for the two pattern test scripts.
+
+test_optimization_goals.py and test_aggressive_rust_patterns.py grew from
+the same v0.2 pattern set; the pieces they still share verbatim live here,
+compiled once per process instead of once per script. Tables that diverged
+stay with their script: the rust-patterns pipeline fused its boilerplate
+and instruction phases into one alternation, and the filler word lists and
+whitespace/capitalization cleanup differ between the two. _polyglot_fast.pyx
+keeps its own copies by design — the compiled extension must stay
+self-contained.
+"""
+
+import re
+
+# Redundant-phrase compression rows common to both pipelines, as
+# (bound sub method, replacement). Row order follows src/patterns.rs
+# (problems before bugs) and DOES matter: the problems-row's "issues"
+# replacement can feed the bugs row, so a synonym chain like
+# "bugs or problems or issues" collapses all the way to "bugs". The
+# rust-patterns script historically ran bugs first and left
+# "bugs or issues" behind on such chains; the Rust order is adopted as
+# the authoritative one since that script's job is to mirror patterns.rs.
+REDUNDANT_CORE = tuple((re.compile(p, re.IGNORECASE).sub, r) for p, r in [
+    (r"very\s+detailed\s+and\s+thorough", "detailed"),
+    (r"detailed\s+and\s+thorough", "detailed"),
+    (r"problems?\s+(or|and)\s+issues", "issues"),
+    (r"bugs?\s+(or|and)\s+issues", "bugs"),
+])
+
+# The goals pipeline appends three context removals of its own
+REDUNDANT_GOALS = REDUNDANT_CORE + tuple(
+    (re.compile(p, re.IGNORECASE).sub, r) for p, r in [
+        (r"that\s+I'?m\s+working\s+on", ""),
+        (r"this\s+code\s+snippet", "this code"),
+        (r"any\s+potential\s+", "any "),
+    ]
+)
+
+# Language directive both pipelines append to their output
+OUTPUT_DIRECTIVE = "\n\n[output_language: english]"
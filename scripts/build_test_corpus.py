@@ -10,39 +10,110 @@ Usage:
 """
 
 import argparse
+import hashlib
+import heapq
 import json
+import multiprocessing
+import os
 import random
+from collections import Counter, defaultdict
 from pathlib import Path
 from typing import List, Dict
-from collections import Counter
 
-
-def load_prompts(suite_dir: Path) -> List[Dict]:
-    """Load prompts from a test suite directory.
+try:
+    import orjson
+except ImportError:  # optional accelerator; stdlib json is used without it
+    orjson = None
+
+if orjson is not None:
+    _json_dumpb = orjson.dumps
+    _json_loads = orjson.loads
+    _JSONDecodeError = orjson.JSONDecodeError
+else:
+    def _json_dumpb(obj):
+        # Same compact UTF-8 bytes orjson emits
+        return json.dumps(obj, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    _json_loads = json.loads
+    _JSONDecodeError = json.JSONDecodeError
+
+try:
+    import ahocorasick
+except ImportError:  # optional accelerator; the plain substring path is used without it
+    ahocorasick = None
+
+try:
+    import tiktoken
+except ImportError:  # optional; the chars/4 token estimate is used without it
+    tiktoken = None
+
+
+# Summary sections show at most this many rows per table; nlargest keeps the
+# display path O(N log K) as the suite/category lists grow.
+_SUMMARY_TOP_K = 50
+
+# Marker tables for categorize_prompt, hoisted so the per-prompt work is a
+# single scan of the text.
+_CODE_MARKERS = ("```", "def ", "function ", "class ", "import ")
+
+_BOILERPLATE_PHRASES = (
+    "I would appreciate",
+    "Please make sure",
+    "Thank you in advance",
+    "Could you please",
+    "I would like you to",
+    "Can you help me",
+)
+_BOILERPLATE_PHRASES_LOWER = tuple(p.lower() for p in _BOILERPLATE_PHRASES)
+
+_INSTRUCTION_VERBS = ("analyze", "explain", "describe", "write", "create")
+
+
+def _build_automaton(words):
+    """Build an Aho-Corasick automaton over literal markers, or None."""
+    if ahocorasick is None:
+        return None
+    automaton = ahocorasick.Automaton()
+    for word in words:
+        automaton.add_word(word, word)
+    automaton.make_automaton()
+    return automaton
+
+
+# One automaton per marker group: a single linear pass over the text replaces
+# one substring scan per marker.
+_CODE_AC = _build_automaton(_CODE_MARKERS)
+_BOILERPLATE_AC = _build_automaton(_BOILERPLATE_PHRASES_LOWER)
+
+
+def load_prompts(suite_dir: Path):
+    """Stream prompts from a test suite directory.
+
+    A generator, so a suite is never materialized in memory — the streaming
+    build in main() keeps only the per-category reservoirs alive.
 
     Args:
         suite_dir: Path to test suite directory
 
-    Returns:
-        List of prompt dictionaries
+    Yields:
+        Prompt dictionaries
     """
     prompts_file = suite_dir / "prompts.jsonl"
     if not prompts_file.exists():
-        return []
+        return
 
-    prompts = []
-    with open(prompts_file, encoding="utf-8") as f:
+    # orjson parses the raw bytes directly — no per-line UTF-8 decode into a
+    # str before parsing, and ~3-5x faster than stdlib json on this workload
+    # (stdlib json also takes bytes, so the fallback shares the code path).
+    with open(prompts_file, "rb") as f:
         for line in f:
             try:
-                data = json.loads(line)
+                data = _json_loads(line)
                 data["source"] = suite_dir.name
-                prompts.append(data)
-            except json.JSONDecodeError as e:
+                yield data
+            except _JSONDecodeError as e:
                 print(f"⚠️  Error parsing line in {prompts_file}: {e}")
                 continue
 
-    return prompts
-
 
 def categorize_prompt(text: str) -> List[str]:
     """Categorize a prompt by its characteristics.
@@ -55,6 +126,7 @@ def categorize_prompt(text: str) -> List[str]:
     """
     categories = []
     length = len(text)
+    low = text.lower()
 
     # Length-based categories
     if length > 200:
@@ -64,86 +136,145 @@ def categorize_prompt(text: str) -> List[str]:
     else:
         categories.append("medium")
 
-    # Content-based categories
-    if any(marker in text for marker in ["```", "def ", "function ", "class ", "import "]):
+    # Content-based categories (single automaton pass when available)
+    if _CODE_AC is not None:
+        if next(_CODE_AC.iter(text), None) is not None:
+            categories.append("code_mixed")
+    elif any(marker in text for marker in _CODE_MARKERS):
         categories.append("code_mixed")
 
-    if any(ord(c) > 127 for c in text):
+    # str.isascii() is a single C scan of the internal buffer, vs iterating
+    # every code point at Python level
+    if not text.isascii():
         categories.append("multilingual")
 
     # Boilerplate detection
-    boilerplate_phrases = [
-        "I would appreciate",
-        "Please make sure",
-        "Thank you in advance",
-        "Could you please",
-        "I would like you to",
-        "Can you help me",
-    ]
-    if any(phrase.lower() in text.lower() for phrase in boilerplate_phrases):
+    if _BOILERPLATE_AC is not None:
+        if next(_BOILERPLATE_AC.iter(low), None) is not None:
+            categories.append("boilerplate")
+    elif any(phrase in low for phrase in _BOILERPLATE_PHRASES_LOWER):
         categories.append("boilerplate")
 
-    # Question vs instruction
+    # Question vs instruction. startswith with a tuple is one C call; no \b
+    # anchor on purpose — 'analyzer ...' counts as an instruction, as before.
     if text.strip().endswith("?"):
         categories.append("question")
-    elif any(text.lower().startswith(verb) for verb in ["analyze", "explain", "describe", "write", "create"]):
+    elif low.startswith(_INSTRUCTION_VERBS):
         categories.append("instruction")
 
     return categories if categories else ["uncategorized"]
 
 
-def categorize_prompts(prompts: List[Dict]) -> Dict[str, List[Dict]]:
+def categorize_prompts(prompts: List[Dict], workers: int = 1) -> Dict[str, List[Dict]]:
     """Categorize all prompts.
 
+    categorize_prompt is pure CPU work on independent texts, so with
+    workers > 1 it fans out over a process pool; pool.map preserves input
+    order, so the resulting category lists are identical to the serial run.
+
     Args:
         prompts: List of prompt dictionaries
+        workers: Number of worker processes (1 = serial)
 
     Returns:
         Dictionary mapping category names to lists of prompts
     """
-    categories = {}
-
-    for prompt in prompts:
-        text = prompt["text"]
-        prompt_categories = categorize_prompt(text)
+    if workers > 1:
+        with multiprocessing.Pool(workers) as pool:
+            cats_lists = pool.map(
+                categorize_prompt, [p["text"] for p in prompts], chunksize=2000
+            )
+    else:
+        cats_lists = [categorize_prompt(p["text"]) for p in prompts]
 
+    # defaultdict drops the membership test + conditional insert per label
+    categories = defaultdict(list)
+    for prompt, prompt_categories in zip(prompts, cats_lists):
         for category in prompt_categories:
-            if category not in categories:
-                categories[category] = []
             categories[category].append(prompt)
 
     return categories
 
 
-def sample_balanced_corpus(
-    categories: Dict[str, List[Dict]],
-    n_per_category: int = 1000
-) -> List[Dict]:
-    """Sample a balanced corpus from categories.
+def build_reservoirs(
+    prompt_stream,
+    n_per_category: int = 1000,
+    rng=None,
+    workers: int = 1,
+    batch_size: int = 10000
+):
+    """Categorize a prompt stream and reservoir-sample each category.
+
+    Single pass, Algorithm R: the first n_per_category prompts of a category
+    fill its reservoir; each later prompt replaces a random slot with
+    probability n/seen. Peak memory is O(categories x n_per_category)
+    regardless of stream length. The stream is consumed in batches so the
+    categorization can fan out over a process pool.
+
+    Args:
+        prompt_stream: Iterable of prompt dictionaries
+        n_per_category: Reservoir size per category
+        rng: Seeded random.Random instance (falls back to the module RNG)
+        workers: Number of worker processes for categorization (1 = serial)
+        batch_size: Prompts categorized per pool dispatch
+
+    Returns:
+        (reservoirs, totals): sampled prompts and total seen count, by category
+    """
+    if rng is None:
+        rng = random  # module-level RNG, for compatibility
+
+    reservoirs: Dict[str, List[Dict]] = {}
+    totals: Dict[str, int] = {}
+
+    batch = []
+
+    def flush():
+        for category, prompts in categorize_prompts(batch, workers=workers).items():
+            reservoir = reservoirs.setdefault(category, [])
+            seen = totals.get(category, 0)
+            for prompt in prompts:
+                seen += 1
+                if len(reservoir) < n_per_category:
+                    reservoir.append(prompt)
+                else:
+                    j = rng.randrange(seen)
+                    if j < n_per_category:
+                        reservoir[j] = prompt
+            totals[category] = seen
+        batch.clear()
+
+    for prompt in prompt_stream:
+        batch.append(prompt)
+        if len(batch) >= batch_size:
+            flush()
+    if batch:
+        flush()
+
+    return reservoirs, totals
+
+
+def label_sampled_corpus(reservoirs: Dict[str, List[Dict]]) -> tuple:
+    """Flatten reservoirs into one corpus, labeling prompts as sampled.
 
     Args:
-        categories: Dictionary of categorized prompts
-        n_per_category: Number of samples per category
+        reservoirs: Per-category sampled prompts
 
     Returns:
-        Balanced list of prompts
+        (corpus, stats): flattened prompt list and per-category sample counts
     """
     corpus = []
     stats = {}
 
-    for category, prompts in sorted(categories.items()):
-        # Sample from this category
-        if len(prompts) > n_per_category:
-            sampled = random.sample(prompts, n_per_category)
-        else:
-            sampled = prompts
-
-        # Add category label to each prompt
+    for category, sampled in sorted(reservoirs.items()):
+        # Add category label to each prompt. A set makes this O(1) per label
+        # instead of a linear scan of the existing list; serialized as a
+        # sorted list at write time.
         for prompt in sampled:
-            if "categories" not in prompt:
-                prompt["categories"] = []
-            if category not in prompt["categories"]:
-                prompt["categories"].append(category)
+            cats = prompt.get("categories")
+            if cats is None:
+                cats = prompt["categories"] = set()
+            cats.add(category)
 
         corpus.extend(sampled)
         stats[category] = len(sampled)
@@ -153,22 +284,46 @@ def sample_balanced_corpus(
     return corpus, stats
 
 
-def deduplicate_corpus(corpus: List[Dict]) -> List[Dict]:
+def _fingerprint(text: str) -> int:
+    """64-bit content fingerprint for deduplication.
+
+    Storing 8-byte digests instead of full prompt strings keeps the seen-set
+    at 8 bytes per prompt regardless of prompt length; a collision would need
+    ~2^32 prompts (birthday bound), far beyond any corpus built here.
+    """
+    return int.from_bytes(
+        hashlib.blake2b(text.encode("utf-8"), digest_size=8).digest(), "little"
+    )
+
+
+def deduplicate_corpus(corpus: List[Dict], workers: int = 1) -> List[Dict]:
     """Remove duplicate prompts.
 
+    With workers > 1 the fingerprint hashing fans out over a process pool
+    (order-preserving); the first-occurrence-wins membership pass stays
+    serial so the kept prompts are identical to the serial run.
+
     Args:
         corpus: List of prompts
+        workers: Number of worker processes (1 = serial)
 
     Returns:
         Deduplicated corpus
     """
-    seen = set()
+    if workers > 1:
+        with multiprocessing.Pool(workers) as pool:
+            hashes = pool.map(
+                _fingerprint, [p["text"] for p in corpus], chunksize=2000
+            )
+    else:
+        hashes = [_fingerprint(p["text"]) for p in corpus]
+
+    seen: set[int] = set()
     deduped = []
 
-    for prompt in corpus:
-        text = prompt["text"]
-        if text not in seen:
-            seen.add(text)
+    for prompt, h in zip(corpus, hashes):
+        if h not in seen:
+            seen.add(h)
             deduped.append(prompt)
 
     duplicates_removed = len(corpus) - len(deduped)
@@ -178,6 +333,56 @@ def deduplicate_corpus(corpus: List[Dict]) -> List[Dict]:
     return deduped
 
 
+def near_deduplicate_corpus(
+    corpus: List[Dict],
+    threshold: float = 0.85,
+    num_perm: int = 128
+) -> List[Dict]:
+    """Remove near-duplicate prompts with MinHash-LSH over character shingles.
+
+    Exact deduplication misses paraphrased prompts, which are common in the
+    HF chat corpora and skew the category balance. Each prompt is minhashed
+    over 5-char shingles of its lowercased text; prompts whose LSH query hits
+    an already-kept prompt are dropped. Sub-linear per-prompt query cost.
+
+    Args:
+        corpus: List of prompts (already exact-deduplicated)
+        threshold: Jaccard similarity above which prompts count as duplicates
+        num_perm: Number of MinHash permutations
+
+    Returns:
+        Corpus with near-duplicates removed
+    """
+    # Imported lazily: only needed behind --near-dup
+    try:
+        from datasketch import MinHash, MinHashLSH
+    except ImportError:
+        raise SystemExit(
+            "❌ datasketch is required for --near-dup\n"
+            "Install with: pip install datasketch"
+        )
+
+    lsh = MinHashLSH(threshold=threshold, num_perm=num_perm)
+    deduped = []
+
+    for i, prompt in enumerate(corpus):
+        low = prompt["text"].lower()
+        mh = MinHash(num_perm=num_perm)
+        for j in range(max(len(low) - 4, 1)):
+            mh.update(low[j:j + 5].encode("utf-8"))
+
+        if lsh.query(mh):
+            continue
+        lsh.insert(str(i), mh)
+        deduped.append(prompt)
+
+    near_dups_removed = len(corpus) - len(deduped)
+    if near_dups_removed > 0:
+        print(f"\n🔄 Removed {near_dups_removed:,} near-duplicate prompts")
+
+    return deduped
+
+
 def main():
     """Main entry point."""
     parser = argparse.ArgumentParser(
@@ -207,11 +412,22 @@ def main():
         default=42,
         help="Random seed for reproducibility"
     )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=1,
+        help="Worker processes for categorization/hashing (1 = serial)"
+    )
+    parser.add_argument(
+        "--near-dup",
+        action="store_true",
+        help="Also remove near-duplicates with MinHash-LSH (requires datasketch)"
+    )
 
     args = parser.parse_args()
 
-    # Set random seed
-    random.seed(args.seed)
+    # Dedicated seeded RNG — no global random state
+    rng = random.Random(args.seed)
 
     print("\n" + "="*60)
     print("Building Comprehensive Test Corpus")
@@ -222,50 +438,95 @@ def main():
     print(f"Random seed: {args.seed}")
     print("="*60)
 
-    # Load all prompts from test suites
-    print("\n📂 Loading prompts from test suites...")
-    all_prompts = []
+    # Stream prompts from the test suites in one fused pass: parse →
+    # exact-dedup on 64-bit fingerprints → categorize → reservoir-sample.
+    # Nothing but the per-category reservoirs (and the fingerprint set) is
+    # ever held in memory, so corpus size no longer bounds RAM.
+    print("\n📂 Streaming prompts from test suites...")
     suite_counts = {}
+    seen_fingerprints = set()
+    stream_duplicates = 0
+
+    def deduped_stream():
+        nonlocal stream_duplicates
+        for suite_dir in sorted(args.input_dir.iterdir()):
+            if suite_dir.is_dir() and suite_dir.name != "q1678":  # Skip Q1678
+                count = 0
+                for prompt in load_prompts(suite_dir):
+                    count += 1
+                    h = _fingerprint(prompt["text"])
+                    if h in seen_fingerprints:
+                        stream_duplicates += 1
+                        continue
+                    seen_fingerprints.add(h)
+                    yield prompt
+                if count:
+                    suite_counts[suite_dir.name] = count
+                    print(f"  ✓ {suite_dir.name:20s}: {count:6,} prompts")
+
+    reservoirs, category_totals = build_reservoirs(
+        deduped_stream(),
+        args.samples_per_category,
+        rng=rng,
+        workers=args.workers,
+    )
 
-    for suite_dir in sorted(args.input_dir.iterdir()):
-        if suite_dir.is_dir() and suite_dir.name != "q1678":  # Skip Q1678
-            prompts = load_prompts(suite_dir)
-            if prompts:
-                all_prompts.extend(prompts)
-                suite_counts[suite_dir.name] = len(prompts)
-                print(f"  ✓ {suite_dir.name:20s}: {len(prompts):6,} prompts")
-
-    if not all_prompts:
+    if not suite_counts:
         print("\n❌ No prompts found!")
         print("Run scripts/download_hf_datasets.py first")
         return
 
-    print(f"\n📊 Total prompts loaded: {len(all_prompts):,}")
-
-    # Categorize prompts
-    print("\n🏷️  Categorizing prompts...")
-    categories = categorize_prompts(all_prompts)
+    print(f"\n📊 Total prompts loaded: {sum(suite_counts.values()):,}")
+    if stream_duplicates:
+        print(f"🔄 Skipped {stream_duplicates:,} duplicate prompts while streaming")
 
-    print(f"\nFound {len(categories)} categories:")
-    for category, prompts in sorted(categories.items(), key=lambda x: len(x[1]), reverse=True):
-        print(f"  {category:15s}: {len(prompts):6,} prompts")
+    # nlargest is O(N log K) instead of a full sort and, like sorted, is
+    # stable — ties keep their insertion order, so the listing is unchanged
+    print(f"\nFound {len(category_totals)} categories:")
+    for category, count in heapq.nlargest(
+        _SUMMARY_TOP_K, category_totals.items(), key=lambda x: x[1]
+    ):
+        print(f"  {category:15s}: {count:6,} prompts")
 
-    # Sample balanced corpus
+    # Flatten the reservoirs into the balanced corpus
     print(f"\n⚖️  Building balanced corpus ({args.samples_per_category:,} per category)...")
-    corpus, category_stats = sample_balanced_corpus(categories, args.samples_per_category)
+    corpus, category_stats = label_sampled_corpus(reservoirs)
 
     print(f"\n📝 Corpus size before deduplication: {len(corpus):,}")
 
-    # Deduplicate
-    corpus = deduplicate_corpus(corpus)
+    # A prompt sampled in several categories sits in each of those
+    # reservoirs; collapse it to one corpus entry (the labels already live
+    # on the shared dict)
+    corpus = deduplicate_corpus(corpus, workers=args.workers)
+    if args.near_dup:
+        corpus = near_deduplicate_corpus(corpus)
 
     print(f"📝 Corpus size after deduplication: {len(corpus):,}")
 
-    # Save corpus
+    # Save corpus (the serializer emits UTF-8 bytes directly; the 1 MiB
+    # buffer coalesces the small per-line writes into few syscalls)
     args.output.parent.mkdir(parents=True, exist_ok=True)
-    with open(args.output, "w", encoding="utf-8") as f:
+    with open(args.output, "wb", buffering=1 << 20) as f:
         for prompt in corpus:
-            f.write(json.dumps(prompt) + "\n")
+            prompt["categories"] = sorted(prompt["categories"])
+            f.write(_json_dumpb(prompt))
+            f.write(b"\n")
+
+    # Size estimates. With tiktoken available this is the real cl100k_base
+    # count — encode_ordinary_batch runs the BPE across threads in one call,
+    # the same speed class as the char sum. The chars/4 rule of thumb is off
+    # by 2-3x on CJK and code-heavy text, so only fall back to it when
+    # tiktoken is missing.
+    total_chars = sum(len(p["text"]) for p in corpus)
+    avg_chars = total_chars / len(corpus) if corpus else 0
+    if tiktoken is not None:
+        enc = tiktoken.get_encoding("cl100k_base")
+        token_counts = enc.encode_ordinary_batch(
+            [p["text"] for p in corpus], num_threads=os.cpu_count()
+        )
+        estimated_tokens = sum(len(t) for t in token_counts)
+    else:
+        estimated_tokens = total_chars / 4  # Rough estimate: 1 token ≈ 4 chars
 
     # Save metadata
     metadata_file = args.output.with_suffix(".meta.json")
@@ -275,6 +536,7 @@ def main():
         "categories": category_stats,
         "samples_per_category": args.samples_per_category,
         "seed": args.seed,
+        "estimated_tokens": int(estimated_tokens),
     }
     with open(metadata_file, "w", encoding="utf-8") as f:
         json.dump(metadata, f, indent=2)
@@ -285,22 +547,21 @@ def main():
     print("="*60)
 
     print("\n📦 By Source:")
-    for source, count in sorted(suite_counts.items(), key=lambda x: x[1], reverse=True):
+    for source, count in heapq.nlargest(
+        _SUMMARY_TOP_K, suite_counts.items(), key=lambda x: x[1]
+    ):
         print(f"  {source:20s}: {count:6,} prompts")
 
     print("\n🏷️  By Category:")
-    for category, count in sorted(category_stats.items(), key=lambda x: x[1], reverse=True):
+    for category, count in heapq.nlargest(
+        _SUMMARY_TOP_K, category_stats.items(), key=lambda x: x[1]
+    ):
         print(f"  {category:15s}: {count:6,} prompts")
 
     print(f"\n📊 Total corpus size: {len(corpus):,} prompts")
     print(f"💾 Saved to: {args.output}")
     print(f"📋 Metadata: {metadata_file}")
 
-    # Calculate size estimates
-    total_chars = sum(len(p["text"]) for p in corpus)
-    avg_chars = total_chars / len(corpus) if corpus else 0
-    estimated_tokens = total_chars / 4  # Rough estimate: 1 token ≈ 4 chars
-
     print(f"\n📏 Size Estimates:")
     print(f"  Total characters: {total_chars:,}")
     print(f"  Average per prompt: {avg_chars:.1f} chars")
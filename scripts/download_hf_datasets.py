@@ -11,10 +11,23 @@ Usage:
 
 import argparse
 import json
+import os
 from pathlib import Path
-from typing import List, Dict, Optional, Callable
+from typing import Iterable, Iterator, List, Dict, Optional, Callable
 import sys
 
+try:
+    import orjson
+except ImportError:  # optional accelerator; stdlib json is used without it
+    orjson = None
+
+if orjson is not None:
+    _json_dumpb = orjson.dumps
+else:
+    def _json_dumpb(obj):
+        # Same compact UTF-8 bytes orjson emits
+        return json.dumps(obj, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
 try:
     from datasets import load_dataset
 except ImportError:
@@ -23,6 +36,31 @@ except ImportError:
     sys.exit(1)
 
 
+# Batched extractors for Dataset.map: each takes a columnar batch and returns
+# a "text" column. Batched + num_proc keeps the data in Arrow and fans the
+# extraction out across cores, instead of building one Python dict per example
+# in a serial loop. Module-level (not lambdas) so they pickle for num_proc.
+
+def _extract_wildchat(batch: Dict) -> Dict:
+    return {"text": [c[0]["content"] if c and len(c) > 0 else None for c in batch["conversation"]]}
+
+
+def _extract_ultrachat(batch: Dict) -> Dict:
+    return {"text": [m[0]["content"] if m and len(m) > 0 else None for m in batch["messages"]]}
+
+
+def _extract_alpaca(batch: Dict) -> Dict:
+    return {"text": list(batch["instruction"])}
+
+
+def _extract_code_mixed(batch: Dict) -> Dict:
+    return {"text": list(batch["prompt"])}
+
+
+def _keep_valid(batch: Dict) -> List[bool]:
+    return [t is not None and isinstance(t, str) and len(t) > 10 for t in batch["text"]]
+
+
 # Dataset configurations
 DATASETS = {
     "wildchat": {
@@ -30,7 +68,7 @@ DATASETS = {
         "samples": 10000,
         "samples_quick": 1000,
         "description": "Real user conversations with ChatGPT",
-        "extract": lambda ex: ex["conversation"][0]["content"] if ex.get("conversation") and len(ex["conversation"]) > 0 else None,
+        "extract": _extract_wildchat,
     },
     "ultrachat": {
         "repo": "HuggingFaceH4/ultrachat_200k",
@@ -38,26 +76,26 @@ DATASETS = {
         "samples_quick": 500,
         "split": "train_sft",
         "description": "High-quality filtered conversations",
-        "extract": lambda ex: ex["messages"][0]["content"] if ex.get("messages") and len(ex["messages"]) > 0 else None,
+        "extract": _extract_ultrachat,
     },
     "alpaca": {
         "repo": "tatsu-lab/alpaca",
         "samples": 5000,
         "samples_quick": 500,
         "description": "Instruction-response pairs",
-        "extract": lambda ex: ex.get("instruction"),
+        "extract": _extract_alpaca,
     },
     "code_mixed": {
         "repo": "iamtarun/python_code_instructions_18k_alpaca",
         "samples": 3000,
         "samples_quick": 300,
         "description": "Code-focused instructions",
-        "extract": lambda ex: ex.get("prompt"),
+        "extract": _extract_code_mixed,
     },
 }
 
 
-def download_dataset(name: str, config: Dict, quick: bool = False) -> List[str]:
+def download_dataset(name: str, config: Dict, quick: bool = False) -> Iterator[str]:
     """Download and extract prompts from a dataset.
 
     Args:
@@ -65,8 +103,9 @@ def download_dataset(name: str, config: Dict, quick: bool = False) -> List[str]:
         config: Dataset configuration
         quick: If True, download fewer samples for quick testing
 
-    Returns:
-        List of extracted prompts
+    Yields:
+        Extracted prompts, streamed batch-by-batch from the Arrow dataset
+        (yields nothing on download error)
     """
     print(f"\n{'='*60}")
     print(f"📥 Downloading: {name}")
@@ -88,66 +127,79 @@ def download_dataset(name: str, config: Dict, quick: bool = False) -> List[str]:
 
     except Exception as e:
         print(f"❌ Error downloading {name}: {e}")
-        return []
+        return
 
-    # Extract prompts
+    # Extract prompts: batched map over Arrow columns, parallel across cores
     print(f"📝 Extracting prompts...")
-    prompts = []
-    skipped = 0
-
-    for i, ex in enumerate(ds):
-        if i % 1000 == 0 and i > 0:
-            print(f"  Processed {i}/{len(ds)} examples...")
+    ds = ds.map(
+        config["extract"],
+        batched=True,
+        batch_size=1000,
+        num_proc=os.cpu_count(),
+        remove_columns=ds.column_names,
+    )
 
-        try:
-            prompt = config["extract"](ex)
-            if prompt and isinstance(prompt, str) and len(prompt) > 10:
-                prompts.append(prompt)
-            else:
-                skipped += 1
-        except Exception as e:
-            skipped += 1
-            if skipped < 10:  # Only show first few errors
-                print(f"⚠️  Error extracting from example {i}: {e}")
+    n_raw = len(ds)
+    ds = ds.filter(_keep_valid, batched=True, batch_size=1000, num_proc=os.cpu_count())
+    skipped = n_raw - len(ds)
 
-    print(f"✅ Extracted {len(prompts)} valid prompts")
+    print(f"✅ Extracted {len(ds)} valid prompts")
     if skipped > 0:
         print(f"⚠️  Skipped {skipped} invalid examples")
 
-    return prompts
+    # Stream the column out in Arrow-sized batches: the consumer never holds
+    # more than one batch of Python strings at a time
+    for batch in ds.iter(batch_size=1000):
+        yield from batch["text"]
 
 
-def save_prompts(prompts: List[str], output_dir: Path, name: str, config: Dict):
+def save_prompts(prompts: Iterable[str], output_dir: Path, name: str, config: Dict) -> int:
     """Save prompts to JSONL file with metadata.
 
+    Writes the JSONL and folds the length statistics into the same pass, so
+    a streamed prompt source is never materialized — O(1) memory regardless
+    of sample count.
+
     Args:
-        prompts: List of prompts to save
+        prompts: Prompts to save (any iterable, typically a generator)
         output_dir: Output directory
         name: Dataset name
         config: Dataset configuration
+
+    Returns:
+        Number of prompts written
     """
     output_dir.mkdir(parents=True, exist_ok=True)
 
-    # Save prompts as JSONL
+    # Single pass: write each line (JSON bytes into a 1 MiB buffer) and
+    # update the running counters as it goes by
     prompts_file = output_dir / "prompts.jsonl"
-    with open(prompts_file, "w", encoding="utf-8") as f:
+    count = 0
+    total_chars = 0
+    min_length = 0
+    max_length = 0
+    with open(prompts_file, "wb", buffering=1 << 20) as f:
         for prompt in prompts:
-            f.write(json.dumps({"text": prompt}) + "\n")
+            f.write(_json_dumpb({"text": prompt}))
+            f.write(b"\n")
+            length = len(prompt)
+            count += 1
+            total_chars += length
+            min_length = length if count == 1 else min(min_length, length)
+            max_length = max(max_length, length)
 
-    # Calculate statistics
-    total_chars = sum(len(p) for p in prompts)
-    avg_length = total_chars / len(prompts) if prompts else 0
+    avg_length = total_chars / count if count else 0
 
     # Save metadata
     metadata = {
         "name": name,
         "source": config["repo"],
         "description": config["description"],
-        "count": len(prompts),
+        "count": count,
         "total_chars": total_chars,
         "avg_length": avg_length,
-        "min_length": min(len(p) for p in prompts) if prompts else 0,
-        "max_length": max(len(p) for p in prompts) if prompts else 0,
+        "min_length": min_length,
+        "max_length": max_length,
     }
     with open(output_dir / "metadata.json", "w", encoding="utf-8") as f:
         json.dump(metadata, f, indent=2)
@@ -157,11 +209,11 @@ def save_prompts(prompts: List[str], output_dir: Path, name: str, config: Dict):
 
 **Source:** {config['repo']}
 **Description:** {config['description']}
-**Samples:** {len(prompts)}
+**Samples:** {count}
 
 ## Statistics
 
-- Total prompts: {len(prompts):,}
+- Total prompts: {count:,}
 - Average length: {avg_length:.1f} characters
 - Min length: {metadata['min_length']} characters
 - Max length: {metadata['max_length']} characters
@@ -192,6 +244,8 @@ Generated: {Path(__file__).name}
     print(f"   Metadata: {output_dir / 'metadata.json'}")
     print(f"   README: {output_dir / 'README.md'}")
 
+    return count
+
 
 def main():
     """Main entry point."""
@@ -242,14 +296,16 @@ def main():
         config = DATASETS[name]
 
         try:
+            # Generator: prompts stream straight from download into the writer
             prompts = download_dataset(name, config, args.quick)
 
-            if prompts:
-                n_samples = config["samples_quick"] if args.quick else config["samples"]
-                output_dir = args.output_dir / f"{name}_{n_samples//1000}k"
-                save_prompts(prompts, output_dir, name, config)
-                total_prompts += len(prompts)
-                successful.append((name, len(prompts)))
+            n_samples = config["samples_quick"] if args.quick else config["samples"]
+            output_dir = args.output_dir / f"{name}_{n_samples//1000}k"
+            count = save_prompts(prompts, output_dir, name, config)
+
+            if count > 0:
+                total_prompts += count
+                successful.append((name, count))
             else:
                 failed.append(name)
 
@@ -14,6 +14,7 @@ For each concept:
 - Precomputed token counts for cl100k_base tokenizer
 """
 
+import os
 import sqlite3
 import sys
 from typing import List, Dict, Tuple
@@ -148,14 +149,49 @@ SAMPLE_CONCEPTS = [
 ]
 
 
+# Per-connection tuning: WAL + NORMAL means one fsync per transaction
+# instead of one per statement; temp_store/cache_size/mmap_size keep sorts,
+# B-tree pages, and reads in memory instead of round-tripping to disk.
+_PRAGMAS = (
+    "journal_mode=WAL",
+    "synchronous=NORMAL",
+    "temp_store=MEMORY",
+    "cache_size=-65536",       # 64 MiB page cache
+    "mmap_size=268435456",     # 256 MiB memory-mapped reads
+)
+
+# Upsert statements hoisted to module scope; executemany prepares each once
+# and reuses the handle for every row.
+_SQL_CONCEPT_UPSERT = """
+    INSERT INTO concepts (qid, label_en, description, category)
+    VALUES (?, ?, ?, ?)
+    ON CONFLICT(qid) DO UPDATE SET
+        label_en = excluded.label_en,
+        description = excluded.description,
+        category = excluded.category
+"""
+
+_SQL_SURFACE_UPSERT = """
+    INSERT INTO surface_forms (qid, tokenizer_id, lang, form, token_count, char_count)
+    VALUES (?, ?, ?, ?, ?, ?)
+    ON CONFLICT(qid, tokenizer_id, lang, form) DO UPDATE SET
+        token_count = excluded.token_count,
+        char_count = excluded.char_count
+"""
+
+
 def get_tokenizer():
     """Get cl100k_base tokenizer (GPT-4, Claude)."""
     return tiktoken.get_encoding("cl100k_base")
 
 
-def count_tokens(text: str, tokenizer) -> int:
-    """Count tokens in text using tokenizer."""
-    return len(tokenizer.encode(text))
+def count_tokens_batch(texts: List[str], tokenizer) -> List[int]:
+    """Count tokens for a batch of texts in one tokenizer call.
+
+    encode_ordinary_batch crosses the Python/Rust boundary once and runs
+    the BPE across threads, instead of one FFI round-trip per form.
+    """
+    return [len(t) for t in tokenizer.encode_ordinary_batch(texts, num_threads=os.cpu_count())]
 
 
 def populate_database(db_path: str):
@@ -163,59 +199,48 @@ def populate_database(db_path: str):
 
     print(f"Populating database: {db_path}")
     conn = sqlite3.connect(db_path)
+    for pragma in _PRAGMAS:
+        conn.execute(f"PRAGMA {pragma}")
     cursor = conn.cursor()
 
     # Initialize tokenizer
     tokenizer = get_tokenizer()
     tokenizer_id = "cl100k_base"
 
-    # Track stats
-    concepts_added = 0
-    surface_forms_added = 0
+    # Collect all rows first, then flush each table with one executemany
+    # inside a single transaction: the statement is prepared once and the
+    # B-tree pages are written once at commit, instead of a parse + implicit
+    # commit per row.
+    concept_rows = []
+    forms = []
 
     for qid, en_label, description, category, translations in SAMPLE_CONCEPTS:
-        # Insert concept
-        cursor.execute("""
-            INSERT INTO concepts (qid, label_en, description, category)
-            VALUES (?, ?, ?, ?)
-            ON CONFLICT(qid) DO UPDATE SET
-                label_en = excluded.label_en,
-                description = excluded.description,
-                category = excluded.category
-        """, (qid, en_label, description, category))
-        concepts_added += 1
-
-        # Insert English surface form
-        en_tokens = count_tokens(en_label, tokenizer)
-        cursor.execute("""
-            INSERT INTO surface_forms (qid, tokenizer_id, lang, form, token_count, char_count)
-            VALUES (?, ?, ?, ?, ?, ?)
-            ON CONFLICT(qid, tokenizer_id, lang, form) DO UPDATE SET
-                token_count = excluded.token_count,
-                char_count = excluded.char_count
-        """, (qid, tokenizer_id, "en", en_label, en_tokens, len(en_label)))
-        surface_forms_added += 1
-
-        # Insert translation surface forms
+        concept_rows.append((qid, en_label, description, category))
+
+        # English surface form, then translations. char_count is the
+        # code-point length (schema semantics), computed once per form here.
+        forms.append((qid, "en", en_label, len(en_label)))
         for lang, form in translations.items():
-            tokens = count_tokens(form, tokenizer)
-            cursor.execute("""
-                INSERT INTO surface_forms (qid, tokenizer_id, lang, form, token_count, char_count)
-                VALUES (?, ?, ?, ?, ?, ?)
-                ON CONFLICT(qid, tokenizer_id, lang, form) DO UPDATE SET
-                    token_count = excluded.token_count,
-                    char_count = excluded.char_count
-            """, (qid, tokenizer_id, lang, form, tokens, len(form)))
-            surface_forms_added += 1
+            forms.append((qid, lang, form, len(form)))
 
         print(f"  Added: {qid} - {en_label} ({len(translations)} translations)")
 
+    # One batched tokenizer call for every surface form
+    token_counts = count_tokens_batch([form for _, _, form, _ in forms], tokenizer)
+    surface_rows = [
+        (qid, tokenizer_id, lang, form, tokens, chars)
+        for (qid, lang, form, chars), tokens in zip(forms, token_counts)
+    ]
+
+    cursor.execute("BEGIN")
+    cursor.executemany(_SQL_CONCEPT_UPSERT, concept_rows)
+    cursor.executemany(_SQL_SURFACE_UPSERT, surface_rows)
     conn.commit()
     conn.close()
 
     print(f"\n✅ Population complete!")
-    print(f"   Concepts: {concepts_added}")
-    print(f"   Surface forms: {surface_forms_added}")
+    print(f"   Concepts: {len(concept_rows)}")
+    print(f"   Surface forms: {len(surface_rows)}")
     print(f"   Languages: en, es, fr, zh, ja")
 
 